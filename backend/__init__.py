@@ -1 +1,10 @@
-from .app import PriceComparisonApp
+__all__ = ["PriceComparisonApp"]
+
+
+def __getattr__(name):
+    # Lazy (PEP 562): importing the package does not pull in Gemini,
+    # sentence-transformers or FAISS until the app is actually used
+    if name == "PriceComparisonApp":
+        from .app import PriceComparisonApp
+        return PriceComparisonApp
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
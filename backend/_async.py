@@ -0,0 +1,29 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever,
+                name="backend-async-loop",
+                daemon=True
+            ).start()
+    return _loop
+
+
+def run_coroutine(coro: Coroutine[Any, Any, Any]) -> Future:
+    """Schedule a coroutine on the shared background event loop.
+
+    Async clients (and their connection pools) stay bound to this one loop,
+    so sync code can reuse them across calls via ``run_coroutine(...).result()``.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop())
@@ -0,0 +1,10 @@
+import functools
+from .config import config
+
+
+@functools.lru_cache(maxsize=1)
+def get_client():
+    """Process-wide Gemini client, so every component shares one connection pool."""
+    from google import genai
+
+    return genai.Client(api_key=config.GEMINI_API_KEY)
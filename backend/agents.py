@@ -1,54 +1,271 @@
-from google import genai
-from typing import Dict
+import re
+import numpy as np
+from cachetools import TTLCache
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Generator, Iterator, Optional
 from .config import config
+from ._async import run_coroutine
+from ._gemini import get_client
 from .vector_db import VectorDatabase
+from .semantic_cache import SemanticCache, context_key
 
+_WEB_RE = re.compile(
+    r"\b(compare|vs|versus|review|latest|news|price history|trends|alternative|similar)\b",
+    re.IGNORECASE
+)
+_RAG_RE = re.compile(
+    r"\b(these|found|results|listed|option|cheapest|best|seller|which|recommended)\b",
+    re.IGNORECASE
+)
 
-class ShoppingAssistant:
-    def __init__(self, context: Dict = None):
-        self.client = genai.Client(api_key=config.GEMINI_API_KEY)
-        self.context = context or {}
-
-    def chat(self, message: str) -> str:
-        prompt = f"""
+# Static instructions go first (as the system instruction) and all per-turn
+# content goes last, so Gemini can reuse the cached prompt prefix across turns.
+SHOPPING_SYSTEM_PROMPT = """
 You are a helpful shopping assistant.
+Use the search context provided with each message to answer the user.
+Give a clear, helpful answer.
+"""
+
+RESEARCH_SYSTEM_PROMPT = """
+You are a research assistant specializing in product comparison.
+Use any web search results or product listings provided with the question.
+Answer clearly and objectively.
+"""
 
+SHOPPING_TURN_TEMPLATE = """
 Context:
-{self.context}
+{context}
+
+Conversation so far:
+{history}
 
 User: {message}
+"""
 
-Give a clear, helpful answer.
+RESEARCH_TURN_TEMPLATE = """
+{additional_context}
+Conversation so far:
+{history}
+
+User question:
+{message}
 """
-        try:
-            response = self.client.generate_content(
-                model=config.GEMINI_MODEL,
-                contents=prompt
-            )
-            return response.text
-        except Exception:
-            return "Sorry, I couldn't process that right now."
 
+NO_CONTEXT_REPLY = "Please run a product search first so I can help."
+ERROR_REPLY = "Sorry, I couldn't process that right now."
 
-class ResearchAssistant:
-    def __init__(self, vector_db: VectorDatabase = None):
-        self.client = genai.Client(api_key=config.GEMINI_API_KEY)
-        self.vector_db = vector_db
+
+def _stream_reply(client, prompt: str, generation_config) -> Generator[str, None, str]:
+    """Yield Gemini's reply chunk by chunk and return the full text.
+
+    Returns "" if the call failed, so callers don't cache a partial reply.
+    """
+    chunks = []
+    try:
+        for chunk in client.models.generate_content_stream(
+            model=config.GEMINI_MODEL,
+            contents=prompt,
+            config=generation_config
+        ):
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield chunk.text
+    except Exception:
+        if not chunks:
+            yield ERROR_REPLY
+        return ""
+    return "".join(chunks)
+
+
+class _Assistant:
+    """Chat loop and conversation memory shared by both assistants.
+
+    Only the last two turns go into the prompt, pre-formatted, so each
+    turn appends to the cached string instead of rebuilding it.
+    """
+
+    def __init__(self, system_prompt: str, semantic_cache: SemanticCache = None):
+        from google.genai import types
+
+        self.client = get_client()
+        self._generation_config = types.GenerateContentConfig(
+            system_instruction=system_prompt
+        )
+        self.semantic_cache = semantic_cache
+        self._cache_scope = None
+        self._history_lines = deque(maxlen=4)
+        self._history_cache = ""
+        # Bumped on reset, so replies still streaming from before it are dropped
+        self._generation = 0
+
+    def reset_history(self):
+        self._generation += 1
+        self._history_lines.clear()
+        self._history_cache = ""
+
+    def _format_history(self) -> str:
+        return self._history_cache or "No previous conversation."
+
+    def _remember(self, message: str, response: str, generation: int):
+        if generation != self._generation:
+            return
+        self._history_lines.append(f"User: {message[:200]}")
+        self._history_lines.append(f"Assistant: {response[:200]}")
+        self._history_cache = "\n".join(self._history_lines)
+
+    def _unavailable_reply(self) -> Optional[str]:
+        """A canned reply for when Gemini shouldn't be asked at all."""
+        return None
+
+    def _use_cache(self, message: str) -> bool:
+        return self.semantic_cache is not None
+
+    def _build_prompt(self, message: str, vector: Optional[np.ndarray]) -> str:
+        raise NotImplementedError
 
     def chat(self, message: str) -> str:
-        prompt = f"""
-You are a research assistant specializing in product comparison.
+        return "".join(self.stream_chat(message))
 
-User question:
-{message}
+    def stream_chat(self, message: str) -> Iterator[str]:
+        """Like chat(), but yields the reply in chunks as Gemini generates it."""
+        unavailable = self._unavailable_reply()
+        if unavailable is not None:
+            yield unavailable
+            return
+
+        generation = self._generation
+        vector = None
+        use_cache = self._use_cache(message)
+        if use_cache:
+            cached, vector = self.semantic_cache.lookup(self._cache_scope, message)
+            if cached is not None:
+                self._remember(message, cached, generation)
+                yield cached
+                return
+
+        response = yield from _stream_reply(
+            self.client,
+            self._build_prompt(message, vector),
+            self._generation_config
+        )
+        if response:
+            if use_cache:
+                self.semantic_cache.add(self._cache_scope, message, vector, response)
+            self._remember(message, response, generation)
+
+
+class ShoppingAssistant(_Assistant):
+    def __init__(self, context: Dict = None, semantic_cache: SemanticCache = None):
+        super().__init__(SHOPPING_SYSTEM_PROMPT, semantic_cache)
+        self.update_context(context or {})
+
+    def update_context(self, context: Dict):
+        self.context = context
+        self._cache_scope = ("shopping", context_key(context))
+        self._context_dirty = True
+
+    def _build_context(self) -> str:
+        if self._context_dirty:
+            self._context_cache = str(self.context)
+            self._context_dirty = False
+        return self._context_cache
+
+    def _unavailable_reply(self) -> Optional[str]:
+        # Without search context Gemini has nothing to ground an answer in
+        return None if self.context else NO_CONTEXT_REPLY
+
+    def _build_prompt(self, message: str, vector: Optional[np.ndarray]) -> str:
+        return SHOPPING_TURN_TEMPLATE.format(
+            context=self._build_context(),
+            history=self._format_history(),
+            message=message
+        )
+
+
+class ResearchAssistant(_Assistant):
+    def __init__(self, vector_db: VectorDatabase = None, semantic_cache: SemanticCache = None):
+        from duckduckgo_search import AsyncDDGS
+
+        super().__init__(RESEARCH_SYSTEM_PROMPT, semantic_cache)
+        self.vector_db = vector_db
+        # Set once a search has stored products to look up
+        self.search_id = None
+        # One async client, reused across searches on the shared background loop
+        self._ddgs = AsyncDDGS()
+        # DuckDuckGo rate-limits aggressively, so repeated queries are served locally
+        self._search_cache = TTLCache(maxsize=256, ttl=config.WEB_SEARCH_CACHE_TTL)
+        self._cache_scope = ("research", None)
+
+    def set_search(self, search_id: Optional[str]):
+        self.search_id = search_id
+        # Replies that drew on the previous search's products no longer apply
+        self._cache_scope = ("research", search_id)
+
+    def _use_cache(self, message: str) -> bool:
+        # Web search results go stale, so those replies are always regenerated
+        return self.semantic_cache is not None and not self._needs_web_search(message)
+
+    def _needs_web_search(self, message: str) -> bool:
+        return bool(_WEB_RE.search(message))
+
+    def _needs_vector_search(self, message: str) -> bool:
+        if self.vector_db is None or self.search_id is None:
+            return False
+        return bool(_RAG_RE.search(message))
+
+    def _web_search(self, query: str) -> str:
+        key = query.lower().strip()
+        if key in self._search_cache:
+            return self._search_cache[key]
 
-Answer clearly and objectively.
-"""
         try:
-            response = self.client.generate_content(
-                model=config.GEMINI_MODEL,
-                contents=prompt
+            results = run_coroutine(self._aweb_search(query)).result()[:1000]
+            self._search_cache[key] = results
+            return results
+        except Exception as e:
+            print("Web search error:", e)
+            return ""
+
+    async def _aweb_search(self, query: str) -> str:
+        results = [
+            r async for r in self._ddgs.text(query, backend="html", max_results=5)
+        ]
+        return "\n".join(f"{r.get('title')}: {r.get('body')}" for r in results)
+
+    def _vector_search(self, query: str, query_embedding: Optional[np.ndarray] = None) -> str:
+        try:
+            results = self.vector_db.search_similar_products(
+                query,
+                query_embedding=query_embedding,
+                n_results=3,
+                search_id=self.search_id
             )
-            return response.text
-        except Exception:
-            return "Sorry, I couldn't process that right now."
\ No newline at end of file
+            documents = results.get("documents", [[]])[0]
+            return "\n".join(f"- {doc}" for doc in documents)
+        except Exception as e:
+            print("Vector search error:", e)
+            return ""
+
+    def _build_prompt(self, message: str, vector: Optional[np.ndarray]) -> str:
+        needs_search = self._needs_web_search(message)
+        needs_rag = self._needs_vector_search(message)
+
+        # Web search and vector lookup are independent I/O, so overlap them
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            f_web = ex.submit(self._web_search, message) if needs_search else None
+            f_rag = ex.submit(self._vector_search, message, vector) if needs_rag else None
+            web = f_web.result() if f_web else ""
+            rag = f_rag.result() if f_rag else ""
+
+        additional_context = ""
+        if web:
+            additional_context += f"\nWeb search results:\n{web}\n"
+        if rag:
+            additional_context += f"\nProducts from the current search:\n{rag}\n"
+
+        return RESEARCH_TURN_TEMPLATE.format(
+            additional_context=additional_context,
+            history=self._format_history(),
+            message=message
+        )
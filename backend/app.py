@@ -1,42 +1,136 @@
-from typing import Dict, List, Optional, Tuple
+import asyncio
+import queue
+import uuid
+from typing import Dict, Iterator, List, Tuple
 from .config import config
+from ._async import run_coroutine
 from .parser import ProductParser
 from .scraper import PriceScraper
 from .vector_db import VectorDatabase
 from .recommender import ProductRecommender
 from .agents import ShoppingAssistant, ResearchAssistant
+from .semantic_cache import SemanticCache
 
 
 class PriceComparisonApp:
-    def __init__(self):
+    def __init__(self, vector_db: VectorDatabase = None):
         if not config.validate():
             raise ValueError("Invalid configuration. Check .env")
 
+        # The vector DB is safe to share between app instances (e.g. one
+        # per browser session); everything below holds per-session state
+        self.vector_db = vector_db or VectorDatabase()
+        self.semantic_cache = SemanticCache(self.vector_db.embedding_model)
         self.parser = ProductParser()
         self.scraper = PriceScraper()
-        self.vector_db = VectorDatabase()
         self.recommender = ProductRecommender()
 
-        self.shopping_assistant = None
-        self.research_assistant = None
+        self.shopping_assistant = ShoppingAssistant(semantic_cache=self.semantic_cache)
+        self.research_assistant = ResearchAssistant(self.vector_db, self.semantic_cache)
+
+    def set_search_context(self, product_info: Dict, recommendation: Dict):
+        """Point the shopping assistant at a search result, e.g. one served from a cache."""
+        self.shopping_assistant.update_context({
+            "product_info": product_info,
+            "recommendation": recommendation
+        })
+        # Earlier turns were about the previous results
+        self.shopping_assistant.reset_history()
+        # Product lookups are limited to what this search stored
+        self.research_assistant.set_search(product_info.get("search_id"))
+
+    def reset_shopping_chat(self):
+        self.shopping_assistant.reset_history()
+
+    def reset_research_chat(self):
+        self.research_assistant.reset_history()
+
+    def chat_with_shopping_assistant(self, message: str) -> str:
+        return self.shopping_assistant.chat(message)
+
+    def chat_with_research_assistant(self, message: str) -> str:
+        return self.research_assistant.chat(message)
+
+    def stream_chat_with_shopping_assistant(self, message: str) -> Iterator[str]:
+        return self.shopping_assistant.stream_chat(message)
+
+    def stream_chat_with_research_assistant(self, message: str) -> Iterator[str]:
+        return self.research_assistant.stream_chat(message)
 
     def process_query(
         self,
         user_query: str,
-        progress_callback=None
+        progress_callback=None,
+        recommendation_callback=None
     ) -> Tuple[Dict, Dict, List[Dict]]:
+        # Run on the shared background loop so async clients keep their
+        # connection pools; events are relayed back to this thread
+        events = queue.SimpleQueue()
+        future = run_coroutine(self.aprocess_query(
+            user_query,
+            lambda step, pct: events.put((progress_callback, (step, pct))),
+            lambda recommendation: events.put((recommendation_callback, (recommendation,)))
+        ))
+        future.add_done_callback(lambda _: events.put(None))
+
+        for callback, args in iter(events.get, None):
+            if callback:
+                callback(*args)
+
+        product_info, recommendation, results = future.result()
+        # Only a single interactive query owns the assistants; batched
+        # queries share this app and would overwrite each other's context
+        self.set_search_context(product_info, recommendation)
+        return product_info, recommendation, results
+
+    def process_queries_batch(
+        self,
+        queries: List[str]
+    ) -> List[Tuple[Dict, Dict, List[Dict]]]:
+        return run_coroutine(self.aprocess_queries_batch(queries)).result()
+
+    async def aprocess_queries_batch(
+        self,
+        queries: List[str]
+    ) -> List[Tuple[Dict, Dict, List[Dict]]]:
+        # Bound in-flight queries so Gemini/SerpAPI quotas are saturated, not exceeded
+        semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_QUERIES)
+
+        async def run(query):
+            async with semaphore:
+                return await self.aprocess_query(query)
+
+        return await asyncio.gather(*(run(q) for q in queries))
+
+    async def aprocess_query(
+        self,
+        user_query: str,
+        progress_callback=None,
+        recommendation_callback=None
+    ) -> Tuple[Dict, Dict, List[Dict]]:
+        """``recommendation_callback`` gets each partial recommendation as
+        Gemini streams it, so picks can be shown before the analysis."""
 
         def update(step, pct):
             if progress_callback:
                 progress_callback(step, pct)
 
-        # 1️⃣ Parse user query using AI
-        update("Understanding your request…", 10)
-        product_info = self.parser.parse_query(user_query)
+        # 1️⃣ + 2️⃣ Parse the query with AI while searching shopping websites
+        # (the search only needs the raw query, so both start together)
+        update("Understanding your request & searching shopping websites…", 10)
+        product_info, search_results = await asyncio.gather(
+            self.parser.aparse_query(user_query),
+            self.scraper.asearch_all_sources(
+                {"search_query": user_query, "region": config.DEFAULT_REGION},
+                lambda source, done, total: update(
+                    f"Searched {source} ({done}/{total})…",
+                    10 + 40 * done // total
+                )
+            )
+        )
 
-        # 2️⃣ REAL SEARCH — GOOGLE SHOPPING (Amazon, Flipkart, etc.)
-        update("Searching shopping websites…", 30)
-        search_results = self.scraper.search_all_sources(product_info)
+        # Tags the stored products so later lookups only see this search
+        product_info["search_id"] = uuid.uuid4().hex
 
         if not search_results:
             return product_info, {
@@ -51,26 +145,24 @@ class PriceComparisonApp:
             product_info.get("preferences", {})
         )
 
-        # 4️⃣ Store in vector DB (for assistant & research)
-        update("Analyzing products…", 70)
-        self.vector_db.add_products(ranked_results)
+        # 4️⃣ + 5️⃣ Store in vector DB while Gemini writes the recommendation
+        update("Analyzing products & generating AI recommendation…", 70)
+        async def recommend():
+            recommendation = None
+            async for recommendation in self.recommender.astream_recommendation(
+                product_info,
+                ranked_results,
+                top_n=5
+            ):
+                if recommendation_callback and recommendation["status"] == "partial":
+                    recommendation_callback(recommendation)
+            return recommendation
 
-        # 5️⃣ AI recommendation on REAL DATA
-        update("Generating AI recommendation…", 85)
-        recommendation = self.recommender.generate_recommendation(
-            product_info,
-            ranked_results,
-            top_n=5
+        _, recommendation = await asyncio.gather(
+            self.vector_db.aadd_products(ranked_results, product_info["search_id"]),
+            recommend()
         )
 
-        # 6️⃣ Init assistants
         update("Finalizing results…", 100)
-        context = {
-            "product_info": product_info,
-            "recommendation": recommendation
-        }
-
-        self.shopping_assistant = ShoppingAssistant(context)
-        self.research_assistant = ResearchAssistant(self.vector_db)
 
         return product_info, recommendation, ranked_results
@@ -1,25 +1,46 @@
 import os
+from dataclasses import dataclass, field
+from typing import Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
 
+REQUIRED_KEYS = ("GEMINI_API_KEY", "SERPAPI_KEY")
+
+
+@dataclass(frozen=True, slots=True)
 class Config:
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
-    GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
-
-    SERPAPI_KEY = os.getenv("SERPAPI_KEY", "")
-    DEFAULT_REGION = "India"
-    DEFAULT_CURRENCY = "INR"
-    MAX_RESULTS = 10
-
-    @classmethod
-    def validate(cls) -> bool:
-        if not cls.GEMINI_API_KEY:
-            print("❌ GEMINI_API_KEY missing")
-            return False
-        if not cls.SERPAPI_KEY:
-            print("❌ SERPAPI_KEY missing")
-            return False
-        return True
+    GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+
+    SERPAPI_KEY: str = os.getenv("SERPAPI_KEY", "")
+    DEFAULT_REGION: str = "India"
+    DEFAULT_CURRENCY: str = "INR"
+    MAX_RESULTS: int = 10
+    MAX_CONCURRENT_QUERIES: int = int(os.getenv("MAX_CONCURRENT_QUERIES", "10"))
+
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    # Empty means auto-detect: cuda, then mps, then cpu
+    EMBEDDING_DEVICE: str = os.getenv("EMBEDDING_DEVICE", "")
+
+    PRODUCTS_DB_PATH: str = os.getenv("PRODUCTS_DB_PATH", "products.db")
+    # Stored products older than this are purged from the store and the index
+    PRODUCT_RETENTION_HOURS: int = int(os.getenv("PRODUCT_RETENTION_HOURS", "24"))
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", ".llm_cache.db")
+    LLM_CACHE_TTL: int = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+    WEB_SEARCH_CACHE_TTL: int = int(os.getenv("WEB_SEARCH_CACHE_TTL", "600"))
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+
+    # Computed once in __post_init__; validate() only reads it
+    missing_keys: Tuple[str, ...] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        missing = tuple(key for key in REQUIRED_KEYS if not getattr(self, key))
+        object.__setattr__(self, "missing_keys", missing)
+
+    def validate(self) -> bool:
+        for key in self.missing_keys:
+            print(f"❌ {key} missing")
+        return not self.missing_keys
 
 config = Config()
@@ -0,0 +1,83 @@
+import faiss
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+# Below this many vectors the index stays exact: int8 codes save little
+# memory there, and ranges trained on a handful of rows clip later ones
+MIN_TRAIN_SIZE = 256
+# Widen the trained per-dimension ranges, so vectors added after training
+# mostly still fit
+RANGE_MARGIN = 0.2
+
+
+class FaissStore:
+    """In-memory inner-product index over L2-normalized embeddings (cosine similarity).
+
+    Built from ``sample`` (the embeddings it will hold) when there are enough
+    of them, vectors are stored as int8 via a scalar quantizer trained on
+    that sample's real value ranges; queries stay float32.
+    """
+
+    def __init__(self, dim: int, sample: Optional[np.ndarray] = None):
+        if sample is not None and len(sample) >= MIN_TRAIN_SIZE:
+            self.index = faiss.IndexScalarQuantizer(
+                dim,
+                faiss.ScalarQuantizer.QT_8bit,
+                faiss.METRIC_INNER_PRODUCT
+            )
+            self.index.sq.rangestat_arg = RANGE_MARGIN
+            matrix = np.ascontiguousarray(sample, dtype=np.float32)
+            faiss.normalize_L2(matrix)
+            self.index.train(matrix)
+            self.trained_on = len(sample)
+        else:
+            self.index = faiss.IndexFlatIP(dim)
+            self.trained_on = 0
+        # Row position in the index -> stored item
+        self.items: List[Dict] = []
+        # Group key (e.g. a search id) -> row positions, for filtered searches
+        self._groups: Dict[str, List[int]] = {}
+
+    @property
+    def needs_retrain(self) -> bool:
+        """True once the index has doubled since training (or grown big
+        enough to quantize), so rebuilding it keeps the ranges current."""
+        return self.index.ntotal >= max(2 * self.trained_on, MIN_TRAIN_SIZE)
+
+    def add(self, embeddings: np.ndarray, items: List[Dict], groups: List[Optional[str]] = None):
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        faiss.normalize_L2(matrix)
+        start = self.index.ntotal
+        self.index.add(matrix)
+        self.items.extend(items)
+        for pos, group in enumerate(groups or [], start):
+            if group is not None:
+                self._groups.setdefault(group, []).append(pos)
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        k: int,
+        group: Optional[str] = None
+    ) -> List[Tuple[float, Dict]]:
+        params = None
+        candidates = self.index.ntotal
+        if group is not None:
+            positions = self._groups.get(group, [])
+            candidates = len(positions)
+            if candidates:
+                params = faiss.SearchParameters(
+                    sel=faiss.IDSelectorBatch(np.asarray(positions, dtype=np.int64))
+                )
+        if candidates == 0:
+            return []
+
+        query = np.ascontiguousarray(query_embedding.reshape(1, -1), dtype=np.float32)
+        faiss.normalize_L2(query)
+        scores, positions = self.index.search(query, min(k, candidates), params=params)
+
+        return [
+            (float(score), self.items[pos])
+            for score, pos in zip(scores[0], positions[0])
+            if pos != -1
+        ]
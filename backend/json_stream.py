@@ -0,0 +1,50 @@
+import orjson
+from typing import Any, List, Tuple
+
+
+class JsonFieldScanner:
+    """Incrementally scans a streamed JSON object and reports each top-level
+    field as soon as its value is complete."""
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._field_start = 0
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        self._buffer += text
+        fields = []
+
+        for i in range(self._pos, len(self._buffer)):
+            ch = self._buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._field_start = i + 1
+            elif ch in "}]" or (ch == "," and self._depth == 1):
+                # A comma or the closing brace at depth 1 ends one "key": value pair
+                if self._depth == 1:
+                    segment = self._buffer[self._field_start:i].strip()
+                    if segment:
+                        fields.extend(orjson.loads("{" + segment + "}").items())
+                    self._field_start = i + 1
+                if ch != ",":
+                    self._depth -= 1
+
+        self._pos = len(self._buffer)
+        return fields
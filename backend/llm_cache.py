@@ -0,0 +1,150 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Callable, Optional
+from .config import config
+
+
+class LLMCache:
+    """Persistent exact-match cache for Gemini responses, backed by SQLite."""
+
+    def __init__(self, path: str = None):
+        self.path = path or config.LLM_CACHE_PATH
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " expires_at REAL"
+            ")"
+        )
+        # Expired rows are never served, so clear them out on open
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE expires_at IS NOT NULL AND expires_at < ?",
+            (time.time(),)
+        )
+        self._conn.commit()
+        self._db_lock = threading.Lock()
+        # Per-key locks so concurrent misses on one prompt make a single call
+        self._locks_guard = threading.Lock()
+        self._key_locks = weakref.WeakValueDictionary()
+        self._async_key_locks = weakref.WeakValueDictionary()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT response, expires_at FROM llm_cache WHERE key = ?",
+                (key,)
+            ).fetchone()
+
+        if row is None:
+            return None
+        response, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            with self._db_lock:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key = ? AND expires_at < ?",
+                    (key, time.time())
+                )
+                self._conn.commit()
+            return None
+        return response
+
+    def set(self, key: str, value: str, ttl: int = None):
+        now = time.time()
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, created_at, expires_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, value, now, now + ttl if ttl else None)
+            )
+            self._conn.commit()
+
+    def key_lock(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def async_key_lock(self, key: str) -> asyncio.Lock:
+        with self._locks_guard:
+            return self._async_key_locks.setdefault(key, asyncio.Lock())
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> LLMCache:
+    # lru_cache would let concurrent first callers each build their own
+    # cache, and with it their own key locks; creation must happen once
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache()
+    return _cache
+
+
+def cache_key(prompt: str, tag: str = "") -> str:
+    return hashlib.sha256(f"{config.GEMINI_MODEL}|{tag}|{prompt}".encode()).hexdigest()
+
+
+def _cacheable(value: str, validate: Optional[Callable[[str], object]]) -> bool:
+    if not value:
+        return False
+    if validate is None:
+        return True
+    try:
+        validate(value)
+        return True
+    except Exception:
+        return False
+
+
+def cached_llm(tag: str, ttl: int = None, validate: Callable[[str], object] = None):
+    """Cache a ``method(self, prompt) -> str`` that calls Gemini.
+
+    Bump ``tag`` whenever the prompt template or response schema changes so
+    stale entries stop matching. ``validate`` is called on each response and
+    should raise if it is unusable; such responses are returned but never
+    cached. Works for both sync and async methods.
+    """
+    ttl = ttl if ttl is not None else config.LLM_CACHE_TTL
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(self, prompt: str) -> str:
+                cache = get_cache()
+                key = cache_key(prompt, tag)
+                async with cache.async_key_lock(key):
+                    cached = cache.get(key)
+                    if cached is not None:
+                        return cached
+                    value = await fn(self, prompt)
+                    if _cacheable(value, validate):
+                        cache.set(key, value, ttl)
+                    return value
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(self, prompt: str) -> str:
+            cache = get_cache()
+            key = cache_key(prompt, tag)
+            with cache.key_lock(key):
+                cached = cache.get(key)
+                if cached is not None:
+                    return cached
+                value = fn(self, prompt)
+                if _cacheable(value, validate):
+                    cache.set(key, value, ttl)
+                return value
+        return wrapper
+
+    return decorator
@@ -1,49 +1,80 @@
-import json
-from google import genai
 from typing import Dict
 from .config import config
+from ._gemini import get_client
+from .llm_cache import cached_llm
+from .schemas import ProductQuery
+
+PROMPT_TEMPLATE = """
+Extract product details from this shopping query.
+
+Query: "{user_query}"
+
+Unless the query says otherwise, use region "{region}", budget currency
+"{currency}", price_priority "lowest" and delivery_priority true.
+"""
 
 class ProductParser:
     def __init__(self):
-        self.client = genai.Client(api_key=config.GEMINI_API_KEY)
+        from google.genai import types
 
-    def parse_query(self, user_query: str) -> Dict:
-        prompt = f"""
-Extract product details from this query and return ONLY valid JSON.
+        self.client = get_client()
+        # Region/currency are fixed per process, so only user_query is left to fill
+        self._prompt_template = (
+            PROMPT_TEMPLATE
+            .replace("{region}", config.DEFAULT_REGION)
+            .replace("{currency}", config.DEFAULT_CURRENCY)
+        )
+        # Structured output guarantees well-formed JSON matching ProductQuery
+        self._generation_config = types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=ProductQuery
+        )
 
-Query: "{user_query}"
+    @cached_llm(tag="parse-v2", validate=ProductQuery.model_validate_json)
+    def _generate(self, prompt: str) -> str:
+        response = self.client.models.generate_content(
+            model=config.GEMINI_MODEL,
+            contents=prompt,
+            config=self._generation_config
+        )
+        return response.text
 
-Format:
-{{
-  "product": "",
-  "brand": null,
-  "model": null,
-  "specifications": {{}},
-  "budget": {{ "min": null, "max": null, "currency": "INR" }},
-  "region": "India",
-  "preferences": {{
-    "price_priority": "lowest",
-    "delivery_priority": true
-  }}
-}}
-"""
+    @cached_llm(tag="parse-v2", validate=ProductQuery.model_validate_json)
+    async def _agenerate(self, prompt: str) -> str:
+        response = await self.client.aio.models.generate_content(
+            model=config.GEMINI_MODEL,
+            contents=prompt,
+            config=self._generation_config
+        )
+        return response.text
 
+    def _to_result(self, result_text: str, user_query: str) -> Dict:
+        parsed = ProductQuery.model_validate_json(result_text).model_dump()
+        parsed["search_query"] = user_query
+        return parsed
+
+    def _fallback(self, user_query: str) -> Dict:
+        return {
+            "product": user_query,
+            "search_query": user_query,
+            "preferences": {"price_priority": "lowest", "delivery_priority": True},
+            "region": config.DEFAULT_REGION
+        }
+
+    def parse_query(self, user_query: str) -> Dict:
         try:
-            response = self.client.generate_content(
-                model=config.GEMINI_MODEL,
-                contents=prompt
-            )
+            result_text = self._generate(self._prompt_template.format(user_query=user_query))
+            return self._to_result(result_text, user_query)
 
-            result_text = response.text.strip()
-            parsed = json.loads(result_text)
-            parsed["search_query"] = user_query
-            return parsed
+        except Exception as e:
+            print("Parser error:", e)
+            return self._fallback(user_query)
+
+    async def aparse_query(self, user_query: str) -> Dict:
+        try:
+            result_text = await self._agenerate(self._prompt_template.format(user_query=user_query))
+            return self._to_result(result_text, user_query)
 
         except Exception as e:
             print("Parser error:", e)
-            return {
-                "product": user_query,
-                "search_query": user_query,
-                "preferences": {"price_priority": "lowest", "delivery_priority": True},
-                "region": config.DEFAULT_REGION
-            }
+            return self._fallback(user_query)
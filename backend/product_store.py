@@ -0,0 +1,96 @@
+import sqlite3
+import threading
+import time
+import numpy as np
+import orjson
+from typing import Dict, List, Optional, Tuple
+from .config import config
+
+
+class ProductStore:
+    """Stored products keyed by id: the full payload, the document text that
+    was embedded and its embedding. FAISS is rebuilt from this on startup."""
+
+    def __init__(self, path: str = None):
+        self.path = path or config.PRODUCTS_DB_PATH
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(products)")}
+        if columns and "search_id" not in columns:
+            # Older databases lack the vectors (kept in Chroma back then) or
+            # the search ids; those rows can't be searched any more
+            self._conn.execute("DROP TABLE products")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS products ("
+            " id TEXT PRIMARY KEY,"
+            " json TEXT NOT NULL,"
+            " document TEXT NOT NULL,"
+            " embedding BLOB NOT NULL,"
+            " added_at REAL NOT NULL,"
+            " search_id TEXT"
+            ")"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS products_added_at ON products (added_at)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def put_many(self, rows: List[Tuple[str, Dict, str, np.ndarray]], search_id: str = None):
+        """Store (id, product, document, embedding) rows from one search."""
+        added_at = time.time()
+        payload = [
+            (
+                id_,
+                orjson.dumps(product, default=str).decode(),
+                document,
+                np.asarray(embedding, dtype=np.float32).tobytes(),
+                added_at,
+                search_id
+            )
+            for id_, product, document, embedding in rows
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO products"
+                " (id, json, document, embedding, added_at, search_id)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                payload
+            )
+            self._conn.commit()
+
+    def get_many(self, ids: List[str]) -> Dict[str, Dict]:
+        if not ids:
+            return {}
+
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, json FROM products WHERE id IN ({placeholders})",
+                ids
+            ).fetchall()
+
+        return {id_: orjson.loads(payload) for id_, payload in rows}
+
+    def load_vectors(self) -> Tuple[List[str], List[str], np.ndarray, List[Optional[str]]]:
+        """Return the ids, documents, embedding matrix and search ids of every
+        stored product."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, document, embedding, search_id FROM products ORDER BY added_at"
+            ).fetchall()
+
+        if not rows:
+            return [], [], np.empty((0, 0), dtype=np.float32), []
+        ids, documents, blobs, search_ids = zip(*rows)
+        embeddings = np.vstack([np.frombuffer(blob, dtype=np.float32) for blob in blobs])
+        return list(ids), list(documents), embeddings, list(search_ids)
+
+    def delete_older_than(self, cutoff: float) -> int:
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM products WHERE added_at < ?",
+                (cutoff,)
+            ).rowcount
+            self._conn.commit()
+        return deleted
@@ -1,11 +1,150 @@
-from google import genai
-from typing import Dict, List
+import functools
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from .config import config
+from ._gemini import get_client
+from .json_stream import JsonFieldScanner
+from .llm_cache import cache_key, cached_llm, get_cache
+from .schemas import Recommendation
+
+RECOMMEND_CACHE_TAG = "recommend-v5"
+
+# Persona and output rules are static, so they live in the system
+# instruction; each call only sends the user's request and the listings.
+RECOMMEND_SYSTEM_PROMPT = """
+You are a shopping expert.
+Pick the best options from the products table (TSV) in each request, based
+on price, seller, rating and delivery.
+Write a short recommendation paragraph as "analysis", and give the idx of
+the best overall pick, the best value pick and the fastest delivery pick
+(null if unknown).
+"""
+
+SUMMARY_FIELDS = ("title", "price_string", "seller", "rating", "reviews", "delivery", "in_stock")
+SUMMARY_HEADER = "\t".join(("idx",) + SUMMARY_FIELDS)
+
+
+def _tsv_cell(value) -> str:
+    if value is None:
+        return ""
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+
+def _parse_recommendation(response_text: str) -> Recommendation:
+    recommendation = Recommendation.model_validate_json(response_text)
+    if not recommendation.analysis.strip():
+        raise ValueError("Empty Gemini response")
+    return recommendation
+
+
+@functools.lru_cache(maxsize=4096)
+def _user_intent(
+    product: str,
+    brand: str,
+    specs: Tuple[Tuple[str, str], ...],
+    budget_max: Optional[float],
+    currency: Optional[str],
+    price_priority: Optional[str],
+    delivery_priority: bool
+) -> str:
+    parts = [
+        product,
+        brand,
+        " ".join(value for _, value in specs),
+        f"budget {budget_max} {currency}" if budget_max else "",
+        f"{price_priority} price" if price_priority else "",
+        "fast delivery" if delivery_priority else ""
+    ]
+    return " ".join(part for part in parts if part)
 
 
 class ProductRecommender:
     def __init__(self):
-        self.client = genai.Client(api_key=config.GEMINI_API_KEY)
+        from google.genai import types
+
+        self.client = get_client()
+        # Structured output returns JSON matching Recommendation directly
+        self._generation_config = types.GenerateContentConfig(
+            system_instruction=RECOMMEND_SYSTEM_PROMPT,
+            response_mime_type="application/json",
+            response_schema=Recommendation
+        )
+
+    def _extract_user_intent(self, product_info: Dict) -> str:
+        budget = product_info.get("budget") or {}
+        preferences = product_info.get("preferences") or {}
+        specs = product_info.get("specifications") or {}
+        return _user_intent(
+            product_info.get("product") or "",
+            product_info.get("brand") or "",
+            tuple(sorted((k, str(v)) for k, v in specs.items() if v)),
+            budget.get("max"),
+            budget.get("currency"),
+            preferences.get("price_priority"),
+            bool(preferences.get("delivery_priority"))
+        )
+
+    def _prepare_products_summary(self, products: List[Dict]) -> str:
+        rows = "\n".join(
+            "\t".join([str(i)] + [_tsv_cell(p.get(field)) for field in SUMMARY_FIELDS])
+            for i, p in enumerate(products)
+        )
+        return f"{SUMMARY_HEADER}\n{rows}"
+
+    def _build_prompt(self, product_info: Dict, products: List[Dict]) -> str:
+        return (
+            f"USER REQUEST:\n{self._extract_user_intent(product_info)}\n\n"
+            f"OPTIONS (TSV):\n{self._prepare_products_summary(products)}"
+        )
+
+    @cached_llm(tag=RECOMMEND_CACHE_TAG, validate=_parse_recommendation)
+    def _generate(self, prompt: str) -> str:
+        response = self.client.models.generate_content(
+            model=config.GEMINI_MODEL,
+            contents=prompt,
+            config=self._generation_config
+        )
+        return response.text
+
+    def _picks(self, fields: Dict, products: List[Dict]) -> Dict:
+        # Drop positions Gemini made up beyond the list it was given
+        picks = {}
+        for name in ("best_overall", "best_value", "fastest_delivery"):
+            index = fields.get(name)
+            picks[name] = index if isinstance(index, int) and 0 <= index < len(products) else None
+        return picks
+
+    def _to_result(self, response_text: str, products: List[Dict]) -> Dict:
+        recommendation = _parse_recommendation(response_text)
+
+        return {
+            "status": "success",
+            "analysis": recommendation.analysis.strip(),
+            "picks": self._picks(recommendation.model_dump(), products),
+            "products": products
+        }
+
+    def _partial(self, fields: Dict, products: List[Dict]) -> Dict:
+        return {
+            "status": "partial",
+            "analysis": fields.get("analysis", ""),
+            "picks": self._picks(fields, products),
+            "products": products
+        }
+
+    def _fallback(self, products: List[Dict]) -> Dict:
+        # Gemini failed: the ranked products stand on their own, without picks
+        return {
+            "status": "fallback",
+            "analysis": "Based on price and availability, this product offers the best value right now.",
+            "products": products
+        }
+
+    def _no_results(self) -> Dict:
+        return {
+            "status": "no_results",
+            "analysis": "No products found.",
+            "products": []
+        }
 
     def generate_recommendation(
         self,
@@ -15,44 +154,73 @@ class ProductRecommender:
     ) -> Dict:
 
         if not results:
-            return {
-                "status": "no_results",
-                "analysis": "No products found.",
-                "products": []
-            }
+            return self._no_results()
 
-        prompt = f"""
-You are a shopping expert.
+        products = results[:top_n]
 
-Analyze the following products and recommend the best option
-based on price, seller, and availability.
+        try:
+            response_text = self._generate(self._build_prompt(product_info, products))
+            return self._to_result(response_text, products)
 
-Products:
-{results[:top_n]}
+        except Exception:
+            return self._fallback(products)
 
-Give a short recommendation paragraph.
-"""
+    async def agenerate_recommendation(
+        self,
+        product_info: Dict,
+        results: List[Dict],
+        top_n: int = 3
+    ) -> Dict:
+        result = None
+        async for result in self.astream_recommendation(product_info, results, top_n):
+            pass
+        return result
 
-        try:
-            response = self.client.generate_content(
-                model=config.GEMINI_MODEL,
-                contents=prompt
-            )
+    async def astream_recommendation(
+        self,
+        product_info: Dict,
+        results: List[Dict],
+        top_n: int = 3
+    ) -> AsyncIterator[Dict]:
+        """Yield a "partial" result each time a top-level field of Gemini's
+        JSON completes, then the final result."""
+
+        if not results:
+            yield self._no_results()
+            return
 
-            analysis = response.text.strip()
+        products = results[:top_n]
+        prompt = self._build_prompt(product_info, products)
+        # Shares entries with _generate, which caches the same prompt and tag
+        cache = get_cache()
+        key = cache_key(prompt, RECOMMEND_CACHE_TAG)
+
+        try:
+            async with cache.async_key_lock(key):
+                cached = cache.get(key)
+                if cached is not None:
+                    yield self._to_result(cached, products)
+                    return
 
-            if not analysis:
-                raise ValueError("Empty Gemini response")
+                scanner = JsonFieldScanner()
+                fields = {}
+                chunks = []
+                async for chunk in await self.client.aio.models.generate_content_stream(
+                    model=config.GEMINI_MODEL,
+                    contents=prompt,
+                    config=self._generation_config
+                ):
+                    text = chunk.text or ""
+                    chunks.append(text)
+                    for name, value in scanner.feed(text):
+                        fields[name] = value
+                        yield self._partial(fields, products)
 
-            return {
-                "status": "success",
-                "analysis": analysis,
-                "products": results[:top_n]
-            }
+                response_text = "".join(chunks)
+                # Raises on an invalid response, which is then never cached
+                result = self._to_result(response_text, products)
+                cache.set(key, response_text, config.LLM_CACHE_TTL)
+            yield result
 
         except Exception:
-            return {
-                "status": "success",
-                "analysis": "Based on price and availability, this product offers the best value right now.",
-                "products": results[:top_n]
-            }
+            yield self._fallback(products)
@@ -0,0 +1,43 @@
+from typing import Optional
+from pydantic import BaseModel
+
+# Response schemas for Gemini structured output. The Gemini API rejects
+# non-null defaults in a response schema, so fields are either required or
+# Optional with a None default.
+
+
+class Specifications(BaseModel):
+    storage: Optional[str] = None
+    ram: Optional[str] = None
+    color: Optional[str] = None
+    size: Optional[str] = None
+
+
+class Budget(BaseModel):
+    min: Optional[float] = None
+    max: Optional[float] = None
+    currency: str
+
+
+class Preferences(BaseModel):
+    price_priority: str
+    delivery_priority: bool
+
+
+class ProductQuery(BaseModel):
+    product: str
+    brand: Optional[str] = None
+    model: Optional[str] = None
+    specifications: Specifications
+    budget: Budget
+    region: str
+    preferences: Preferences
+
+
+class Recommendation(BaseModel):
+    # 0-based positions in the product list sent to Gemini. They come before
+    # the analysis so a streamed response yields the picks first.
+    best_overall: int
+    best_value: int
+    fastest_delivery: Optional[int] = None
+    analysis: str
@@ -1,21 +1,47 @@
-import time
+import asyncio
+import functools
+import re
+import numpy as np
 from typing import Dict, List, Optional
-from serpapi import GoogleSearch
 from .config import config
+from ._async import run_coroutine
+
+SERPAPI_URL = "https://serpapi.com/search.json"
+
+_DELIVERY_RE = re.compile(r"free|fast|express", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_http():
+    """Keep-alive pool for SerpAPI; only used on the shared background loop."""
+    import httpx
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_keepalive_connections=20),
+        timeout=15
+    )
+
+
+def _delivery_score(delivery: Optional[str]) -> int:
+    hits = {match.lower() for match in _DELIVERY_RE.findall(delivery or "")}
+    return 50 * ("free" in hits) + 30 * ("fast" in hits or "express" in hits)
+
+
+def _parse_rating(raw) -> Optional[float]:
+    # Missing or unparsable ratings become None, so callers can test `if rating:`
+    try:
+        return float(raw) if raw else None
+    except (TypeError, ValueError):
+        return None
 
 
 class PriceScraper:
     def __init__(self):
         self.api_key = config.SERPAPI_KEY
 
-    def search_google_shopping(self, product_info: Dict) -> List[Dict]:
-        query = product_info.get("search_query", "")
-        region = product_info.get("region", "India")
-
-        # 🔥 FORCE INDIA + INR
-        params = {
+        # 🔥 FORCE INDIA + INR (identical for every request, so built once)
+        self._base_params = {
             "engine": "google_shopping",
-            "q": query,
             "location": "India",
             "google_domain": "google.co.in",
             "gl": "in",
@@ -25,18 +51,28 @@ class PriceScraper:
             "num": config.MAX_RESULTS
         }
 
-        try:
-            search = GoogleSearch(params)
-            results = search.get_dict()
-            items = results.get("shopping_results", [])
+    def _build_params(self, product_info: Dict) -> Dict:
+        return {**self._base_params, "q": product_info.get("search_query", "")}
 
-            parsed = []
-            for item in items:
-                parsed_item = self._normalize_result(item)
-                if parsed_item:
-                    parsed.append(parsed_item)
+    def _parse_results(self, results: Dict) -> List[Dict]:
+        items = results.get("shopping_results", [])
 
-            return parsed
+        parsed = []
+        for item in items:
+            parsed_item = self._normalize_result(item)
+            if parsed_item:
+                parsed.append(parsed_item)
+
+        return parsed
+
+    async def asearch_google_shopping(self, product_info: Dict) -> List[Dict]:
+        try:
+            response = await _get_http().get(
+                SERPAPI_URL,
+                params=self._build_params(product_info)
+            )
+            response.raise_for_status()
+            return self._parse_results(response.json())
 
         except Exception as e:
             print("❌ Google Shopping error:", e)
@@ -49,7 +85,7 @@ class PriceScraper:
                 "price": item.get("extracted_price"),
                 "price_string": item.get("price", "₹ N/A"),
                 "seller": item.get("source", "Unknown"),
-                "rating": item.get("rating"),
+                "rating": _parse_rating(item.get("rating")),
                 "reviews": item.get("reviews"),
                 "url": item.get("link"),
                 "thumbnail": item.get("thumbnail"),
@@ -62,10 +98,53 @@ class PriceScraper:
             return None
 
     def search_all_sources(self, product_info: Dict) -> List[Dict]:
-        return self.search_google_shopping(product_info)
+        # Same concurrent fan-out as the async path, on the shared loop
+        return run_coroutine(self.asearch_all_sources(product_info)).result()
+
+    async def asearch_all_sources(
+        self,
+        product_info: Dict,
+        progress_callback=None
+    ) -> List[Dict]:
+        # Sources hit different hosts, so they are fetched concurrently
+        # rather than one after another with a delay in between
+        sources = (("Google Shopping", self.asearch_google_shopping),)
+
+        async def run(name, search):
+            return name, await search(product_info)
+
+        results = []
+        pending = [run(name, search) for name, search in sources]
+        for done, next_source in enumerate(asyncio.as_completed(pending), 1):
+            name, items = await next_source
+            results.extend(items)
+            # Report each source as it returns, not after the slowest one
+            if progress_callback:
+                progress_callback(name, done, len(sources))
+        return results
 
     def rank_results(self, results: List[Dict], preferences: Dict) -> List[Dict]:
-        return sorted(
-            results,
-            key=lambda x: x.get("price", float("inf"))
+        if not results:
+            return []
+
+        # Listings without a price sort last; a stable sort keeps the
+        # original order among equal prices
+        prices = np.fromiter(
+            (np.inf if r.get("price") is None else r["price"] for r in results),
+            dtype=np.float64,
+            count=len(results)
+        )
+
+        if not preferences.get("delivery_priority"):
+            order = np.argsort(prices, kind="stable")
+            return [results[i] for i in order]
+
+        # Among equal prices, free delivery beats fast/express beats the rest
+        delivery_scores = np.fromiter(
+            (_delivery_score(r.get("delivery")) for r in results),
+            dtype=np.int64,
+            count=len(results)
         )
+        # lexsort uses the last key as primary and is stable
+        order = np.lexsort((-delivery_scores, prices))
+        return [results[i] for i in order]
@@ -0,0 +1,74 @@
+import hashlib
+import threading
+import numpy as np
+import orjson
+from typing import Any, Dict, Hashable, Optional, Tuple
+from .config import config
+
+
+def context_key(context: Dict) -> str:
+    """Stable hash of an assistant context, used to scope cache entries."""
+    payload = orjson.dumps(
+        context,
+        default=str,
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+    )
+    return hashlib.sha256(payload).hexdigest()
+
+
+class SemanticCache:
+    """Returns earlier responses for messages that are identical or whose
+    embeddings are near-identical."""
+
+    def __init__(self, embedding_model, threshold: float = None):
+        self.embedding_model = embedding_model
+        self.threshold = threshold if threshold is not None else config.SEMANTIC_CACHE_THRESHOLD
+        self._lock = threading.Lock()
+        # (scope, text) -> response, checked before any embedding work
+        self._exact = {}
+        # scope -> (L2-normalized float32 matrix, parallel list of responses)
+        self._entries = {}
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embedding_model.encode(
+            [text],
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )[0].astype(np.float32)
+
+    def lookup(self, scope: Hashable, text: str) -> Tuple[Optional[Any], Optional[np.ndarray]]:
+        """Return (cached response or None, embedding of text).
+
+        The embedding is None on an exact hit, since none had to be computed.
+        """
+        exact = self._exact.get((scope, text))
+        if exact is not None:
+            return exact, None
+
+        vector = self.embed(text)
+        entry = self._entries.get(scope)
+        if entry is None:
+            return None, vector
+
+        matrix, responses = entry
+        sims = matrix @ vector
+        best = int(np.argmax(sims))
+        if sims[best] >= self.threshold:
+            return responses[best], vector
+        return None, vector
+
+    def add(self, scope: Hashable, text: str, vector: Optional[np.ndarray], response: Any):
+        if vector is None:
+            vector = self.embed(text)
+
+        with self._lock:
+            self._exact[(scope, text)] = response
+            matrix, responses = self._entries.get(
+                scope,
+                (np.empty((0, vector.shape[0]), dtype=np.float32), [])
+            )
+            self._entries[scope] = (
+                np.vstack([matrix, vector[np.newaxis, :]]),
+                responses + [response]
+            )
@@ -1,58 +1,190 @@
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
+import asyncio
+import functools
+import threading
+import time
+import uuid
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
+from .config import config
+from .product_store import ProductStore
+
+
+def _embedding_device() -> str:
+    if config.EMBEDDING_DEVICE:
+        return config.EMBEDDING_DEVICE
+
+    import torch
+
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+@functools.lru_cache(maxsize=4096)
+def _document_text(title: str, seller: str, price_string: str, rating, delivery: str) -> str:
+    parts = [
+        title,
+        seller,
+        price_string,
+        f"rating {rating}" if rating else "",
+        delivery
+    ]
+    return " | ".join(part for part in parts if part)
+
+
+@functools.lru_cache(maxsize=1)
+def get_embedding_model():
+    """Process-wide SentenceTransformer, so the weights are loaded only once."""
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(config.EMBEDDING_MODEL, device=_embedding_device())
+
+
+# How often stores check for expired products and rebuild the index
+_PRUNE_INTERVAL = 3600
 
 
 class VectorDatabase:
     def __init__(self):
-        # ✅ Force CPU (already fixed)
-        self.embedding_model = SentenceTransformer(
-            "sentence-transformers/all-MiniLM-L6-v2",
-            device="cpu"
+        # ✅ Shared model (EMBEDDING_DEVICE=cpu forces CPU)
+        self.embedding_model = get_embedding_model()
+        self._dim = self.embedding_model.get_sentence_embedding_dimension()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vector-db")
+        # Stores can run on two pool threads at once, and a rebuild swaps the
+        # index; FAISS isn't thread-safe
+        self._index_lock = threading.Lock()
+
+        # ✅ Payloads and embeddings persist in SQLite, so products survive
+        # restarts without re-embedding; search runs on an in-memory FAISS index
+        self.products = ProductStore()
+        with self._index_lock:
+            self._rebuild_index()
+
+    def _rebuild_index(self):
+        """Drop expired products and rebuild the index from the rest.
+
+        Runs at startup, then at most every _PRUNE_INTERVAL since the
+        database is a process-wide singleton, and whenever the quantizer
+        should be retrained on the grown collection. Caller holds _index_lock.
+        """
+        # Heavy dependencies are imported on first use, not at module import
+        from .faiss_store import FaissStore
+
+        self.products.delete_older_than(
+            time.time() - config.PRODUCT_RETENTION_HOURS * 3600
         )
+        ids, documents, embeddings, search_ids = self.products.load_vectors()
 
-        # ✅ Explicit tenant + database (FIXES default_tenant ERROR)
-        self.client = chromadb.Client(
-            Settings(
-                persist_directory="./chroma_db",
-                anonymized_telemetry=False
+        index = FaissStore(self._dim, embeddings if ids else None)
+        if ids:
+            # Search ids come back too, so scoped lookups survive a rebuild
+            index.add(
+                embeddings,
+                [{"id": id_, "document": doc} for id_, doc in zip(ids, documents)],
+                search_ids
             )
+        self.index = index
+        self._next_prune = time.time() + _PRUNE_INTERVAL
+
+    def _create_document_text(self, product: Dict) -> str:
+        return _document_text(
+            product.get("title") or "",
+            product.get("seller") or "",
+            product.get("price_string") or "",
+            product.get("rating"),
+            product.get("delivery") or ""
         )
 
-        self.collection = self.client.get_or_create_collection(
-            name="products"
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        return self.embedding_model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
         )
 
-    def add_products(self, products: List[Dict]):
+    async def aencode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        # Encoding is CPU-bound; a small dedicated pool keeps it off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(self.encode, texts, batch_size)
+        )
+
+    def _prepare_products(self, products: List[Dict]) -> Tuple[List[str], List[str]]:
+        # Random ids: the store is shared by every session, so nothing
+        # time- or position-based is guaranteed unique
+        ids = [uuid.uuid4().hex for _ in products]
+        documents = [self._create_document_text(p) for p in products]
+        return ids, documents
+
+    def _store(
+        self,
+        ids: List[str],
+        documents: List[str],
+        products: List[Dict],
+        embeddings: np.ndarray,
+        search_id: Optional[str]
+    ):
+        with self._index_lock:
+            # SQLite and the index are updated together, so a rebuild never
+            # sees a row the index is about to get as well
+            self.products.put_many(list(zip(ids, products, documents, embeddings)), search_id)
+            self.index.add(
+                embeddings,
+                [{"id": id_, "document": doc} for id_, doc in zip(ids, documents)],
+                [search_id] * len(ids)
+            )
+            if time.time() >= self._next_prune or self.index.needs_retrain:
+                self._rebuild_index()
+
+    def add_products(self, products: List[Dict], search_id: str = None):
         if not products:
             return
 
-        documents = []
-        ids = []
-
-        for i, product in enumerate(products):
-            documents.append(product.get("title", ""))
-            ids.append(f"product_{i}")
+        # One batched encode + one store for the whole ranked list
+        ids, documents = self._prepare_products(products)
+        self._store(ids, documents, products, self.encode(documents), search_id)
 
-        embeddings = self.embedding_model.encode(
-            documents,
-            convert_to_numpy=True
-        ).tolist()
+    async def aadd_products(self, products: List[Dict], search_id: str = None):
+        if not products:
+            return
 
-        self.collection.add(
-            documents=documents,
-            embeddings=embeddings,
-            ids=ids
+        ids, documents = self._prepare_products(products)
+        embeddings = await self.aencode(documents)
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            self._store, ids, documents, products, embeddings, search_id
         )
 
-    def search_similar_products(self, query: str, n_results: int = 3):
-        query_embedding = self.embedding_model.encode(
-            [query],
-            convert_to_numpy=True
-        ).tolist()
+    def _search(self, query_embedding: np.ndarray, n_results: int, search_id: Optional[str]) -> Dict:
+        with self._index_lock:
+            hits = self.index.search(query_embedding, n_results, group=search_id)
+        payloads = self.products.get_many([item["id"] for _, item in hits])
 
-        return self.collection.query(
-            query_embeddings=query_embedding,
-            n_results=n_results
-        )
+        # Same shape as a Chroma query result, which callers were written against
+        return {
+            "ids": [[item["id"] for _, item in hits]],
+            "documents": [[item["document"] for _, item in hits]],
+            "metadatas": [[payloads.get(item["id"], {}) for _, item in hits]],
+            "distances": [[1.0 - score for score, _ in hits]]
+        }
+
+    def search_similar_products(
+        self,
+        query: str = None,
+        *,
+        query_embedding: Optional[np.ndarray] = None,
+        n_results: int = 3,
+        search_id: str = None
+    ):
+        # Only products stored under search_id are considered, if given.
+        # Callers that already embedded the query (e.g. via the semantic
+        # cache) pass the vector in and skip a second encode
+        if query_embedding is None:
+            query_embedding = self.encode([query], batch_size=1)[0]
+        return self._search(query_embedding, n_results, search_id)
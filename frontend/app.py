@@ -3,16 +3,18 @@ Streamlit Frontend
 User interface for the AI-Driven Product Price Comparison System
 """
 
+import copy
+import html
+import threading
+import time
+import httpx
+import pandas as pd
 import streamlit as st
-import sys
-import os
-from pathlib import Path
-
-# Add backend to path
-backend_path = Path(__file__).parent.parent / "backend"
-sys.path.insert(0, str(backend_path.parent))
+from cachetools import TTLCache
+from concurrent.futures import ThreadPoolExecutor
 
 from backend.app import PriceComparisonApp
+from backend.vector_db import VectorDatabase
 
 from backend.config import config
 
@@ -24,8 +26,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS
-st.markdown("""
+# Custom CSS (st.html skips the markdown parser)
+APP_CSS = """
 <style>
     .main-header {
         font-size: 3rem;
@@ -59,7 +61,8 @@ st.markdown("""
         width: 100%;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+st.html(APP_CSS)
 
 
 # Initialize session state
@@ -77,16 +80,39 @@ def init_session_state():
         st.session_state.shopping_chat_history = []
     if 'research_chat_history' not in st.session_state:
         st.session_state.research_chat_history = []
+    if 'shopping_pending' not in st.session_state:
+        st.session_state.shopping_pending = None
+    if 'research_pending' not in st.session_state:
+        st.session_state.research_pending = None
     if 'search_performed' not in st.session_state:
         st.session_state.search_performed = False
 
 
+# Search-view widgets whose values should survive switching to another view
+SEARCH_WIDGET_KEYS = ("product_query", "example_picker", "card_view", "show_all_results")
+
+
+def keep_search_widget_state():
+    """Streamlit drops a widget's state on any run that doesn't render it;
+    re-assigning the value before the widgets are built keeps it."""
+    for key in SEARCH_WIDGET_KEYS:
+        if key in st.session_state:
+            st.session_state[key] = st.session_state[key]
+
+
+@st.cache_resource(show_spinner="Initializing AI system...")
+def get_vector_db():
+    """Load the embedding model and vector store once per process."""
+    return VectorDatabase()
+
+
 def initialize_app():
     """Initialize the application."""
     if st.session_state.app is None:
         try:
-            with st.spinner("Initializing AI system..."):
-                st.session_state.app = PriceComparisonApp()
+            # Chat assistants keep per-user history, so each session gets its
+            # own app around the shared vector store
+            st.session_state.app = PriceComparisonApp(vector_db=get_vector_db())
             st.success("✅ System initialized!")
         except Exception as e:
             st.error(f"❌ Initialization failed: {e}")
@@ -95,13 +121,29 @@ def initialize_app():
     return True
 
 
+HEADER_HTML = (
+    '<div class="main-header">🛒 AI Price Comparison</div>'
+    '<div class="sub-header">Find the best deals with AI-powered product search</div>'
+)
+
+
 def display_header():
     """Display the application header."""
-    st.markdown('<div class="main-header">🛒 AI Price Comparison</div>', unsafe_allow_html=True)
-    st.markdown(
-        '<div class="sub-header">Find the best deals with AI-powered product search</div>',
-        unsafe_allow_html=True
-    )
+    st.html(HEADER_HTML)
+
+
+EXAMPLE_QUERIES = [
+    "Find the cheapest iPhone 15 128GB in India",
+    "Samsung Galaxy S23 under 50000 rupees with good ratings",
+    "Best gaming laptop under $1500 with fast delivery",
+    "Sony WH-1000XM5 headphones best price",
+]
+
+
+def use_example_query():
+    """Copy the picked example into the search box."""
+    if st.session_state.example_picker:
+        st.session_state.product_query = st.session_state.example_picker
 
 
 def search_interface():
@@ -115,18 +157,13 @@ def search_interface():
         key="product_query"
     )
     
-    # Example queries
-    with st.expander("💡 Example Queries"):
-        examples = [
-            "Find the cheapest iPhone 15 128GB in India",
-            "Samsung Galaxy S23 under 50000 rupees with good ratings",
-            "Best gaming laptop under $1500 with fast delivery",
-            "Sony WH-1000XM5 headphones best price",
-        ]
-        for example in examples:
-            if st.button(example, key=f"example_{examples.index(example)}"):
-                st.session_state.product_query = example
-                st.rerun()
+    # Example queries: one widget; the callback fills the search box before the rerun
+    st.selectbox(
+        "💡 Example Queries",
+        [""] + EXAMPLE_QUERIES,
+        key="example_picker",
+        on_change=use_example_query
+    )
     
     # Search button
     col1, col2, col3 = st.columns([1, 2, 1])
@@ -144,12 +181,37 @@ def search_interface():
                 progress_bar.progress(progress)
                 status_text.text(step)
             
+            # Gemini's picks arrive before its analysis; show them right away
+            partial_view = st.empty()
+            
+            def show_partial(recommendation: dict):
+                with partial_view.container():
+                    st.markdown("## 💡 AI Recommendation")
+                    display_picks(recommendation)
+                    if recommendation.get("analysis"):
+                        st.info(recommendation["analysis"])
+                    else:
+                        st.caption("✍️ Writing the analysis…")
+            
             try:
-                # Perform search
-                product_info, recommendation, results = st.session_state.app.process_query(
-                    user_query,
-                    progress_callback=update_progress
-                )
+                # Perform search (repeat queries are served from the cache)
+                app = st.session_state.app
+                key = (user_query, config.DEFAULT_REGION, config.DEFAULT_CURRENCY)
+                cached = get_cached_search(key)
+                if cached is not None:
+                    product_info, recommendation, results = cached
+                else:
+                    product_info, recommendation, results = app.process_query(
+                        user_query,
+                        progress_callback=update_progress,
+                        recommendation_callback=show_partial
+                    )
+                    store_search(key, (product_info, recommendation, results))
+                # On a cache hit this session's assistant hasn't seen the results yet;
+                # either way its earlier chat was about other products
+                app.set_search_context(product_info, recommendation)
+                st.session_state.shopping_chat_history = []
+                st.session_state.shopping_pending = None
                 
                 # Store results
                 st.session_state.product_info = product_info
@@ -160,6 +222,7 @@ def search_interface():
                 # Clear progress
                 progress_bar.empty()
                 status_text.empty()
+                partial_view.empty()
                 
                 st.success("✅ Search complete!")
                 st.rerun()
@@ -168,6 +231,104 @@ def search_interface():
                 st.error(f"❌ Search failed: {e}")
                 progress_bar.empty()
                 status_text.empty()
+                partial_view.empty()
+
+
+@st.cache_resource
+def search_cache():
+    """Searches shared by all sessions, keyed by query/region/currency."""
+    return TTLCache(maxsize=128, ttl=600), threading.Lock()
+
+
+def get_cached_search(key: tuple):
+    cache, lock = search_cache()
+    with lock:
+        hit = cache.get(key)
+    # Each session gets its own copy, as st.cache_data would hand out
+    return copy.deepcopy(hit) if hit is not None else None
+
+
+def store_search(key: tuple, search: tuple):
+    # Only real Gemini recommendations are kept; "no results" and the
+    # fallback should be retried on the next search
+    if search[1].get("status") != "success":
+        return
+    cache, lock = search_cache()
+    with lock:
+        cache[key] = copy.deepcopy(search)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_thumbnail(url: str):
+    """Download a thumbnail once; None if it can't be fetched."""
+    try:
+        response = httpx.get(url, timeout=5, follow_redirects=True)
+        response.raise_for_status()
+        return response.content
+    except httpx.HTTPError:
+        return None
+
+
+def prefetch_thumbnails(urls: list) -> dict:
+    """Fetch all thumbnails in parallel, keyed by URL."""
+    urls = list(dict.fromkeys(url for url in urls if url))
+    if not urls:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(urls)) as ex:
+        return dict(zip(urls, ex.map(fetch_thumbnail, urls)))
+
+
+# Top-5 table: product keys and their column headers
+TABLE_FIELDS = ('title', 'price_string', 'seller', 'rating', 'delivery', 'thumbnail', 'url')
+TABLE_COLUMNS = ["Title", "Price", "Seller", "Rating", "Delivery", "Image", "Link"]
+
+
+def product_card_html(i: int, product: dict) -> str:
+    """Render a product's text fields as a single HTML card."""
+    title, price_str, seller, rating, reviews, delivery = (
+        product.get(key) for key in ('title', 'price_string', 'seller', 'rating', 'reviews', 'delivery')
+    )
+    title = html.escape(str(title or 'N/A'))
+    price_str = html.escape(str(price_str or 'N/A'))
+    seller = html.escape(str(seller or 'N/A'))
+    reviews = reviews or ''
+    
+    parts = [
+        f'<h3>{i}. {title}</h3>',
+        f'<div class="price-tag">💰 {price_str}</div>',
+        f'<p><b>Seller:</b> {seller}</p>',
+    ]
+    if rating:
+        parts.append(f'<p><span class="rating">⭐ {html.escape(str(rating))}</span> {html.escape(str(reviews))}</p>')
+    if delivery:
+        parts.append(f'<p><b>Delivery:</b> {html.escape(str(delivery))}</p>')
+    
+    return f'<div class="product-card">{"".join(parts)}</div>'
+
+
+PICK_LABELS = (
+    ("best_overall", "🥇 Best Overall"),
+    ("best_value", "💰 Best Value"),
+    ("fastest_delivery", "🚚 Fastest Delivery"),
+)
+
+
+def display_picks(recommendation: dict):
+    """Show Gemini's picks, one column each."""
+    picks = recommendation.get("picks") or {}
+    products = recommendation.get("products", [])
+    chosen = [
+        (label, products[picks[name]])
+        for name, label in PICK_LABELS
+        if picks.get(name) is not None
+    ]
+    if not chosen:
+        return
+    
+    for col, (label, product) in zip(st.columns(len(chosen)), chosen):
+        with col:
+            st.markdown(f"**{label}**")
+            st.markdown(f"{product.get('title') or 'N/A'}  \n💰 {product.get('price_string') or 'N/A'}")
 
 
 def display_results():
@@ -182,13 +343,15 @@ def display_results():
         st.warning("😔 No products found matching your criteria. Try a different search.")
         return
     
-    if recommendation.get("status") != "success":
+    if recommendation.get("status") not in ("success", "fallback"):
         st.error("❌ Unable to generate recommendations. Please try again.")
         return
     
     # Display recommendation analysis
     st.markdown("## 💡 AI Recommendation")
     
+    display_picks(recommendation)
+    
     analysis = recommendation.get("analysis", "")
     if analysis:
         st.info(analysis)
@@ -202,55 +365,106 @@ def display_results():
         st.warning("No product recommendations available.")
         return
     
-    # Display products in cards
-    for i, product in enumerate(products[:5], 1):
-        with st.container():
-            st.markdown('<div class="product-card">', unsafe_allow_html=True)
-            
-            col1, col2 = st.columns([3, 1])
-            
-            with col1:
-                # Product title
-                st.markdown(f"### {i}. {product.get('title', 'N/A')}")
-                
-                # Price
-                price_str = product.get('price_string', 'N/A')
-                st.markdown(f'<div class="price-tag">💰 {price_str}</div>', unsafe_allow_html=True)
-                
-                # Seller and rating
-                seller = product.get('seller', 'N/A')
-                rating = product.get('rating', 'N/A')
-                reviews = product.get('reviews', '')
+    top_products = products[:5]
+    
+    # Table by default: one Arrow payload instead of columns/widgets per product
+    if not st.toggle("🃏 Card view", key="card_view"):
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    [product.get(key) for key in TABLE_FIELDS]
+                    for product in top_products
+                ],
+                columns=TABLE_COLUMNS
+            ),
+            column_config={
+                "Image": st.column_config.ImageColumn("Image"),
+                "Link": st.column_config.LinkColumn("Link", display_text="🛒 View"),
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+    else:
+        # Display products in cards: one markdown per card instead of one per field
+        thumbnails = prefetch_thumbnails([product.get('thumbnail') for product in top_products])
+        for i, product in enumerate(top_products, 1):
+            thumbnail, url = product.get('thumbnail'), product.get('url')
+            with st.container():
+                col1, col2 = st.columns([3, 1])
                 
-                st.markdown(f"**Seller:** {seller}")
-                if rating and rating != 'N/A':
-                    st.markdown(f'<span class="rating">⭐ {rating}</span> {reviews}', unsafe_allow_html=True)
+                with col1:
+                    st.markdown(product_card_html(i, product), unsafe_allow_html=True)
                 
-                # Delivery
-                delivery = product.get('delivery', '')
-                if delivery:
-                    st.markdown(f"**Delivery:** {delivery}")
-            
-            with col2:
-                # Thumbnail
-                thumbnail = product.get('thumbnail', '')
-                if thumbnail:
-                    st.image(thumbnail, width=150)
-                
-                # Link
-                url = product.get('url', '')
-                if url:
-                    st.link_button("🛒 View Product", url, use_container_width=True)
-            
-            st.markdown('</div>', unsafe_allow_html=True)
+                with col2:
+                    # Thumbnail
+                    if thumbnail:
+                        # Fall back to the URL if the prefetch failed
+                        st.image(thumbnails.get(thumbnail) or thumbnail, width=150)
+                    
+                    # Link
+                    if url:
+                        st.link_button("🛒 View Product", url, use_container_width=True)
     
-    # Show all results
+    # Show all results (only built when asked for; expander bodies run on every rerun)
     if len(results) > 5:
-        with st.expander(f"📋 View All {len(results)} Results"):
-            for i, product in enumerate(results, 1):
-                st.markdown(f"{i}. **{product.get('title')}** - {product.get('price_string')} ({product.get('seller')})")
+        if st.checkbox(f"📋 View All {len(results)} Results", key="show_all_results"):
+            # One table payload instead of a markdown element per result
+            all_results = pd.DataFrame(results, columns=["title", "price_string", "seller"])
+            all_results.columns = ["Title", "Price", "Seller"]
+            all_results.index += 1
+            st.table(all_results)
+
+
+@st.cache_resource
+def chat_executor():
+    """Worker threads that generate chat replies, shared by all sessions."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="chat-reply")
+
+
+def collect_reply(stream, chunks: list) -> str:
+    """Drain a reply stream into chunks, so the UI can show partial text."""
+    for chunk in stream:
+        chunks.append(chunk)
+    return "".join(chunks)
+
+
+def start_reply(kind: str, stream):
+    """Generate an assistant reply in the background and remember it as pending."""
+    chunks = []
+    st.session_state[f"{kind}_pending"] = {
+        "chunks": chunks,
+        "future": chat_executor().submit(collect_reply, stream, chunks),
+    }
+
+
+def finish_reply(kind: str):
+    """File a finished background reply into the chat history."""
+    pending = st.session_state[f"{kind}_pending"]
+    if pending is None or not pending["future"].done():
+        return
+    
+    future = pending["future"]
+    if future.exception():
+        response = "".join(pending["chunks"]) or "Sorry, I couldn't process that right now."
+    else:
+        response = future.result()
+    st.session_state[f"{kind}_chat_history"].append({"role": "assistant", "content": response})
+    st.session_state[f"{kind}_pending"] = None
+
+
+def poll_reply(kind: str):
+    """Show a pending reply as it streams in, then rerun just this chat.
+    
+    Only the chat fragment reruns, so the reply can be filed and the input
+    re-enabled without a full-app rerun.
+    """
+    with st.chat_message("assistant"):
+        st.markdown("".join(st.session_state[f"{kind}_pending"]["chunks"]) or "…")
+    time.sleep(0.5)
+    st.rerun(scope="fragment")
 
 
+@st.fragment
 def shopping_assistant_interface():
     """Display shopping assistant chat interface."""
     if not st.session_state.search_performed:
@@ -260,57 +474,68 @@ def shopping_assistant_interface():
     st.markdown("## 🤖 Shopping Assistant")
     st.markdown("Ask questions about the products, sellers, delivery, or any clarifications.")
     
+    # A reply generated in the background may have finished since the last run
+    finish_reply("shopping")
+    
     # Display chat history
     for message in st.session_state.shopping_chat_history:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
     
-    # Chat input
-    if prompt := st.chat_input("Ask the Shopping Assistant..."):
+    # Chat input (disabled until the current reply is done)
+    pending = st.session_state.shopping_pending
+    if prompt := st.chat_input("Ask the Shopping Assistant...", disabled=pending is not None):
         # Add user message
         st.session_state.shopping_chat_history.append({"role": "user", "content": prompt})
         
-        with st.chat_message("user"):
-            st.markdown(prompt)
-        
-        # Get assistant response
-        with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = st.session_state.app.chat_with_shopping_assistant(prompt)
-            st.markdown(response)
-        
-        # Add assistant message
-        st.session_state.shopping_chat_history.append({"role": "assistant", "content": response})
-        st.rerun()
+        # Get assistant response off the script thread
+        start_reply("shopping", st.session_state.app.stream_chat_with_shopping_assistant(prompt))
+        st.rerun(scope="fragment")
+    
+    # Reply still being generated in the background
+    if pending is not None:
+        poll_reply("shopping")
 
 
+@st.fragment
 def research_assistant_interface():
     """Display research assistant chat interface."""
     st.markdown("## 🔬 Research Assistant")
     st.markdown("Get deep insights, comparisons, and product research with web search and database access.")
     
+    # A reply generated in the background may have finished since the last run
+    finish_reply("research")
+    
     # Display chat history
     for message in st.session_state.research_chat_history:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
     
-    # Chat input
-    if prompt := st.chat_input("Ask the Research Assistant..."):
+    # Chat input (disabled until the current reply is done)
+    pending = st.session_state.research_pending
+    if prompt := st.chat_input("Ask the Research Assistant...", disabled=pending is not None):
         # Add user message
         st.session_state.research_chat_history.append({"role": "user", "content": prompt})
         
-        with st.chat_message("user"):
-            st.markdown(prompt)
-        
-        # Get assistant response
-        with st.chat_message("assistant"):
-            with st.spinner("Researching..."):
-                response = st.session_state.app.chat_with_research_assistant(prompt)
-            st.markdown(response)
-        
-        # Add assistant message
-        st.session_state.research_chat_history.append({"role": "assistant", "content": response})
-        st.rerun()
+        # Get assistant response off the script thread
+        start_reply("research", st.session_state.app.stream_chat_with_research_assistant(prompt))
+        st.rerun(scope="fragment")
+    
+    # Reply still being generated in the background
+    if pending is not None:
+        poll_reply("research")
+
+
+@st.cache_data(ttl=3600)
+def cached_config_snapshot():
+    """Config is fixed for the process, so validate and read it once, not per rerun."""
+    return {
+        "valid": config.validate(),
+        "model": config.GEMINI_MODEL,
+        "region": config.DEFAULT_REGION,
+        "currency": config.DEFAULT_CURRENCY,
+        "max_results": config.MAX_RESULTS,
+    }
 
 
 def sidebar():
@@ -318,17 +543,19 @@ def sidebar():
     with st.sidebar:
         st.markdown("## ⚙️ Settings")
         
+        settings = cached_config_snapshot()
+        
         # Configuration status
-        if config.validate():
+        if settings["valid"]:
             st.success("✅ Configuration Valid")
         else:
             st.error("❌ Invalid Configuration")
         
         st.markdown("### 🔧 Current Settings")
-        st.markdown(f"**Model:** {config.GEMINI_MODEL}")
-        st.markdown(f"**Region:** {config.DEFAULT_REGION}")
-        st.markdown(f"**Currency:** {config.DEFAULT_CURRENCY}")
-        st.markdown(f"**Max Results:** {config.MAX_RESULTS}")
+        st.markdown(f"**Model:** {settings['model']}")
+        st.markdown(f"**Region:** {settings['region']}")
+        st.markdown(f"**Currency:** {settings['currency']}")
+        st.markdown(f"**Max Results:** {settings['max_results']}")
         
         st.markdown("---")
         
@@ -341,11 +568,17 @@ def sidebar():
             st.session_state.recommendation = None
             st.session_state.results = []
             st.session_state.shopping_chat_history = []
+            st.session_state.shopping_pending = None
+            st.session_state.app.reset_shopping_chat()
             st.rerun()
         
         if st.button("🗑️ Clear Chat History", use_container_width=True):
             st.session_state.shopping_chat_history = []
             st.session_state.research_chat_history = []
+            st.session_state.shopping_pending = None
+            st.session_state.research_pending = None
+            st.session_state.app.reset_shopping_chat()
+            st.session_state.app.reset_research_chat()
             st.rerun()
         
         st.markdown("---")
@@ -368,6 +601,7 @@ def main():
     """Main application."""
     # Initialize
     init_session_state()
+    keep_search_widget_state()
     
     # Display header
     display_header()
@@ -379,17 +613,21 @@ def main():
     # Sidebar
     sidebar()
     
-    # Main content tabs
-    tab1, tab2, tab3 = st.tabs(["🔍 Search", "🤖 Shopping Assistant", "🔬 Research Assistant"])
+    # Main content views: unlike st.tabs, only the selected view's widgets are built
+    view = st.radio(
+        "View",
+        ["🔍 Search", "🤖 Shopping Assistant", "🔬 Research Assistant"],
+        horizontal=True,
+        key="active_tab",
+        label_visibility="collapsed"
+    )
     
-    with tab1:
+    if view == "🔍 Search":
         search_interface()
         display_results()
-    
-    with tab2:
+    elif view == "🤖 Shopping Assistant":
         shopping_assistant_interface()
-    
-    with tab3:
+    else:
         research_assistant_interface()
 
 
@@ -4,14 +4,6 @@ Terminal Test Script
 Test the Price Comparison AI system from command line.
 """
 
-import sys
-import os
-from pathlib import Path
-
-# Add backend to path
-backend_path = Path(__file__).parent / "backend"
-sys.path.insert(0, str(Path(__file__).parent))
-
 from backend.app import PriceComparisonApp
 from rich.console import Console
 from rich.table import Table
@@ -59,7 +51,7 @@ def display_results(recommendation, results):
         console.print("\n[yellow]😔 No products found matching your criteria.[/yellow]")
         return
     
-    if recommendation.get("status") != "success":
+    if recommendation.get("status") not in ("success", "fallback"):
         console.print("\n[red]❌ Unable to generate recommendations.[/red]")
         return
     
@@ -68,6 +60,18 @@ def display_results(recommendation, results):
     if analysis:
         console.print(Panel(analysis, title="💡 AI Analysis", border_style="green"))
     
+    # Display Gemini's picks
+    picks = recommendation.get("picks") or {}
+    for name, label in (
+        ("best_overall", "🥇 Best Overall"),
+        ("best_value", "💰 Best Value"),
+        ("fastest_delivery", "🚚 Fastest Delivery"),
+    ):
+        index = picks.get(name)
+        if index is not None:
+            product = recommendation["products"][index]
+            console.print(f"[bold]{label}:[/bold] {product.get('title', 'N/A')} ({product.get('price_string', 'N/A')})")
+    
     # Display top products
     console.print("\n[bold]🏆 Top Recommendations:[/bold]\n")
     
@@ -75,21 +79,19 @@ def display_results(recommendation, results):
     
     table = Table(show_header=True, header_style="bold magenta", box=box.ROUNDED)
     table.add_column("#", style="cyan", width=3)
-    table.add_column("Product", style="white", width=40)
+    # Rich truncates long titles with an ellipsis while rendering
+    table.add_column("Product", style="white", width=40, overflow="ellipsis", no_wrap=True)
     table.add_column("Price", style="green", width=12)
     table.add_column("Seller", style="yellow", width=15)
     table.add_column("Rating", style="magenta", width=10)
     
     for i, product in enumerate(products, 1):
-        title = product.get("title", "N/A")
-        if len(title) > 37:
-            title = title[:37] + "..."
+        title, price, seller = (
+            product.get(key, "N/A") for key in ("title", "price_string", "seller")
+        )
+        rating = product.get("rating")
         
-        price = product.get("price_string", "N/A")
-        seller = product.get("seller", "N/A")
-        rating = str(product.get("rating", "N/A"))
-        
-        table.add_row(str(i), title, price, seller, f"⭐ {rating}")
+        table.add_row(str(i), title, price, seller, f"⭐ {rating}" if rating else "N/A")
     
     console.print(table)
     
@@ -165,6 +167,14 @@ def main():
         app = PriceComparisonApp()
         console.print("[green]✅ System initialized successfully![/green]\n")
         
+        # One progress display and task, reused for every search; it is only
+        # live while a query runs so it doesn't interfere with input prompts
+        progress = Progress(console=console)
+        task = progress.add_task("[cyan]Searching...", total=100)
+        
+        def update_progress(step: str, prog: int):
+            progress.update(task, completed=prog, description=f"[cyan]{step}")
+        
         while True:
             # Get search query
             console.print("[bold]🔍 Product Search[/bold]")
@@ -183,12 +193,8 @@ def main():
             
             # Process query with progress
             console.print()
-            with Progress() as progress:
-                task = progress.add_task("[cyan]Searching...", total=100)
-                
-                def update_progress(step: str, prog: int):
-                    progress.update(task, completed=prog, description=f"[cyan]{step}")
-                
+            progress.reset(task, description="[cyan]Searching...")
+            with progress:
                 try:
                     product_info, recommendation, results = app.process_query(
                         query,